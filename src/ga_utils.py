@@ -1,5 +1,26 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from multiprocessing.pool import Pool
+from operator import attrgetter
+import os
 import random
-from queens import Board
+import sys
+from queens import EMPTY_ROW, Board, count_attacks
+
+# Free-threaded builds of Python (3.13t onwards) can run fitness evaluations on
+# several threads at once. Anywhere else, the GIL would have the threads take
+# turns, so they would only add overhead
+FREE_THREADED = not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+@lru_cache(maxsize=1 << 16)
+def evaluate_chromosome(chromosome: bytes) -> int:
+    # Computes the fitness of a chromosome (the rows of a Board)
+    # Populations share a lot of chromosomes between elitism and children of
+    # similar parents, so fitnesses are remembered across generations (and
+    # across runs). This lives at the module level so that worker processes
+    # can pickle it
+    return count_attacks(chromosome)
 
 class SelectionMethods:
     """
@@ -41,7 +62,8 @@ class SelectionMethods:
     @staticmethod
     def tournament_selection(
                 population: list[Board],
-                proportion: float
+                proportion: float,
+                fitnesses: list[int] | None = None
             ) -> Board:
         """
         Chooses the best individual out of a subset of the population
@@ -55,6 +77,10 @@ class SelectionMethods:
             The population to select from
         proportion: float
             The proportion of the population to use for the tournament
+        fitnesses: list[int] | None
+            The number of attacks of each individual in the population. When
+            selecting many times from the same population, computing this once
+            up front avoids looking up each contender's fitness
 
         Returns
         -------
@@ -69,16 +95,13 @@ class SelectionMethods:
             raise ValueError(f"The tournament proportion {proportion} is " +
                             f"invalid for population size {len(population)}.")
 
-        # Select first random Board
-        parent = random.choice(population)
+        if fitnesses is None:
+            fitnesses = [individual.num_attacking for individual in population]
 
-        # Choose n random Boards and choose the best out of them
-        for _ in range(size):
-            opponent = random.choice(population)
-            if opponent.num_attacking < parent.num_attacking:
-                parent = opponent
-
-        return parent
+        # Draw a first random Board and n random opponents all at once, and
+        # choose the best out of them (the earliest drawn wins ties)
+        contenders = random.choices(range(len(population)), k=size + 1)
+        return population[min(contenders, key=fitnesses.__getitem__)]
 
     @staticmethod
     def random_selection(population: list[Board]) -> Board:
@@ -99,12 +122,43 @@ class GeneticAlgorithm:
     MUTATION_PROBABILITY = 0.5
     TOURNAMENT_PROPORTION = 0.05
 
-    def __init__(self, board: Board, log: bool = True) -> None:
+    # How many times a child that is a duplicate of another individual in its
+    # generation gets mutated to try to make it unique
+    DUPLICATE_RETRIES = 3
+
+    # The number of chromosomes sent to a worker process at a time when
+    # evaluating a population in parallel
+    EVALUATION_CHUNKSIZE = 64
+
+    # The fewest fitness evaluations worth sending to worker processes. Fewer
+    # than this are quicker to evaluate here than to send out
+    MIN_PARALLEL_EVALUATIONS = 4 * EVALUATION_CHUNKSIZE
+
+    def __init__(
+                self,
+                board: Board,
+                log: bool = True,
+                pool: Pool | None = None
+            ) -> None:
         self.input_board = board
         self.log = log
 
+        # If given a pool of worker processes, the fitness of each generation
+        # is evaluated by the workers while this process does the selection,
+        # crossover, and mutation. The same pool is reused every generation
+        self.pool = pool
+
+        # Without a pool, a free-threaded Python does the same with threads
+        self.threads: ThreadPoolExecutor | None = None
+        if self.pool is None and FREE_THREADED:
+            self.threads = ThreadPoolExecutor(os.cpu_count())
+
         # Does the generation loop of the algorithm
-        found_population, self.cost = self.gen_loop()
+        try:
+            found_population, self.cost = self.gen_loop()
+        finally:
+            if self.threads is not None:
+                self.threads.shutdown()
         self.best = GeneticAlgorithm.get_best_individual(found_population)
         if self.log:
             print(f"Best found has {self.best.num_attacking} attacks.")
@@ -113,17 +167,25 @@ class GeneticAlgorithm:
 
         # Initialize population based on slight variations of the input board
         population = [self.input_board]
+        num_moves = (self.input_board.n - 1) * sum(
+            row != EMPTY_ROW for row in self.input_board.rows
+        )
         while len(population) < GeneticAlgorithm.NUM_INDIVIDUALS:
-            curr = random.choice(
-                    [Board.from_str(repr(self.input_board))] +
-                    self.input_board.possible_moves
-                )
+
+            # Either copy the input board or make one of its possible moves
+            # (each being equally likely), building only the chosen board
+            if random.randrange(num_moves + 1):
+                curr = self.input_board.random_neighbor()
+            else:
+                curr = self.input_board.clone()
 
             if random.random() < GeneticAlgorithm.MUTATION_PROBABILITY:
                 GeneticAlgorithm.mutate(curr)
 
             population.append(curr)
 
+        self.evaluate_population(population)
+
         # Find out what the best individual that we're starting off of is
         best = GeneticAlgorithm.get_best_individual(population)
         if self.log:
@@ -154,9 +216,10 @@ class GeneticAlgorithm:
             # always get passed along to the next generation.
             best = GeneticAlgorithm.get_best_individual(current_population)
             next_population = [best]
+            seen = {bytes(best.rows)}
 
             # If we already found a solution, early exit
-            if not best.num_attacking:
+            if best.is_solved:
                 current_population = next_population
                 return current_population, i - 1
 
@@ -179,62 +242,142 @@ class GeneticAlgorithm:
                     f"Best at generation {i} has {best.num_attacking} attacks."
                 )
 
+            # Every tournament of this generation compares the same fitnesses
+            fitnesses = [
+                individual.num_attacking for individual in current_population
+            ]
+
+            # Draw this generation's crossover points and mutation swaps in
+            # batches rather than one call at a time (there is at most one
+            # crossover and one swap per child)
+            n = self.input_board.n
+            num_children = GeneticAlgorithm.NUM_INDIVIDUALS
+            crossover_points = iter(random.choices(range(1, n), k=num_children))
+            swap_indices = iter(random.choices(range(n), k=2 * num_children))
+
             # Fill the next population
             while len(next_population) < GeneticAlgorithm.NUM_INDIVIDUALS:
 
                 # Selection
                 parent_one = SelectionMethods.tournament_selection(
-                    current_population, GeneticAlgorithm.TOURNAMENT_PROPORTION
+                    current_population,
+                    GeneticAlgorithm.TOURNAMENT_PROPORTION,
+                    fitnesses
                 )
                 parent_two = SelectionMethods.tournament_selection(
-                    current_population, GeneticAlgorithm.TOURNAMENT_PROPORTION
+                    current_population,
+                    GeneticAlgorithm.TOURNAMENT_PROPORTION,
+                    fitnesses
                 )
 
                 # Crossover
-                child_one = GeneticAlgorithm.crossover(parent_one, parent_two)
-                child_two = GeneticAlgorithm.crossover(parent_one, parent_two)
+                child_one = GeneticAlgorithm.crossover(
+                    parent_one, parent_two, next(crossover_points)
+                )
+                child_two = GeneticAlgorithm.crossover(
+                    parent_one, parent_two, next(crossover_points)
+                )
 
                 # Mutation
                 if random.random() <= GeneticAlgorithm.MUTATION_PROBABILITY:
-                    GeneticAlgorithm.mutate(child_one)
-                    GeneticAlgorithm.mutate(child_two)
+                    GeneticAlgorithm.mutate(
+                        child_one, next(swap_indices), next(swap_indices)
+                    )
+                    GeneticAlgorithm.mutate(
+                        child_two, next(swap_indices), next(swap_indices)
+                    )
 
                 # Add the children to the next generation's population
-                next_population.append(child_one)
-                if len(next_population) < GeneticAlgorithm.NUM_INDIVIDUALS:
-                    next_population.append(child_two)
+                # (making them unique first, when they can be)
+                for child in (child_one, child_two):
+                    if len(next_population) >= GeneticAlgorithm.NUM_INDIVIDUALS:
+                        break
+
+                    GeneticAlgorithm.make_unique(child, seen)
+                    next_population.append(child)
 
             # Prepare for next iteration
+            self.evaluate_population(next_population)
             current_population = next_population
 
         return current_population, GeneticAlgorithm.NUM_GENERATIONS
 
+    def evaluate_population(self, population: list[Board]) -> None:
+        # Only evaluate the individuals that don't already know their fitness
+        unevaluated = [
+            individual for individual in population
+            if not individual.has_cached_attacks
+        ]
+        chromosomes = [bytes(individual.rows) for individual in unevaluated]
+
+        parallel = len(chromosomes) >= GeneticAlgorithm.MIN_PARALLEL_EVALUATIONS
+        if self.pool is not None and parallel:
+            fitnesses = self.pool.imap(
+                evaluate_chromosome,
+                chromosomes,
+                chunksize=GeneticAlgorithm.EVALUATION_CHUNKSIZE
+            )
+        elif self.threads is not None and parallel:
+            fitnesses = self.threads.map(evaluate_chromosome, chromosomes)
+        else:
+            fitnesses = map(evaluate_chromosome, chromosomes)
+
+        for individual, fitness in zip(unevaluated, fitnesses):
+            individual.num_attacking = fitness
+
     @staticmethod
-    def crossover(parent_one: Board, parent_two: Board):
-        crossover_point = random.randint(1, parent_one.n - 1)
+    def crossover(
+                parent_one: Board,
+                parent_two: Board,
+                crossover_point: int | None = None
+            ) -> Board:
+        # Choose where to cross over (unless it was drawn ahead of time)
+        if crossover_point is None:
+            crossover_point = random.randint(1, parent_one.n - 1)
 
         # Create a new child out of the first portion of the first parent
         # and second portion of the second parent
-        child_chromosome = (
-            repr(parent_one)[:crossover_point] +
-            repr(parent_two)[crossover_point:]
+        return Board.from_rows(
+            parent_one.rows[:crossover_point] +
+            parent_two.rows[crossover_point:]
         )
 
-        return Board.from_str(child_chromosome)
-
     @staticmethod
-    def mutate(child: Board) -> None:
-
-        # Choose two random, different, indices and swap them
-        id1 = random.randint(0, len(repr(child)) - 1)
-        id2 = random.randint(0, len(repr(child)) - 1)
+    def mutate(
+                child: Board,
+                id1: int | None = None,
+                id2: int | None = None
+            ) -> None:
+
+        # Choose two random, different, indices and swap them (any indices
+        # drawn ahead of time are used first)
+        if id1 is None:
+            id1 = random.randint(0, child.n - 1)
+        if id2 is None:
+            id2 = random.randint(0, child.n - 1)
 
         while id2 == id1:
-            id2 = random.randint(0, len(repr(child)) - 1)
+            id2 = random.randint(0, child.n - 1)
+
+        child.swap_queens(id1, id2)
+
+    @staticmethod
+    def make_unique(child: Board, seen: set[bytes]) -> None:
+        # Mutate a child whose chromosome was already seen this generation, so
+        # the population keeps its diversity rather than spending fitness
+        # evaluations on copies. After a few tries, the duplicate is kept
+        chromosome = bytes(child.rows)
+        for _ in range(GeneticAlgorithm.DUPLICATE_RETRIES):
+            if chromosome not in seen:
+                break
+
+            GeneticAlgorithm.mutate(child)
+            chromosome = bytes(child.rows)
 
-        child.queens[id1], child.queens[id2] = child.queens[id2], child.queens[id1]
+        seen.add(chromosome)
 
     @staticmethod
     def get_best_individual(population: list[Board]):
         # Retrieve the best individual based on the number of queens under attack
-        return min(population, key=lambda x: x.num_attacking)
+        # (attrgetter looks the attribute up in C rather than through a lambda)
+        return min(population, key=attrgetter("num_attacking"))
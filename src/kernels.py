@@ -0,0 +1,303 @@
+from functools import lru_cache
+from math import exp
+import random
+
+from queens import EMPTY_ROW, count_attacks, count_lines
+
+# The solvers' search loops, run directly on the rows of a Board (a bytearray
+# holding the row of the queen in each column) along with the number of queens
+# on each row, diagonal, and anti-diagonal. Rather than building Boards for
+# every neighbor, only these counts are kept up to date, so each step is a
+# handful of integer operations. The line arithmetic of Board.attacks_without
+# and Board.conflicting_queens is written out inline here on purpose, since a
+# function call per neighbor would cost more than the arithmetic itself
+
+# Below this exponent, exp() is smaller than the smallest non-zero number that
+# random.random() returns (2 ** -53), so annealing would all but never accept
+# a move that scores this badly at the current temperature
+ACCEPTANCE_CUTOFF = -37
+
+@lru_cache(maxsize=None)
+def column_squares(n: int) -> tuple[tuple[tuple[int, int, int], ...], ...]:
+    """
+    Precomputes the lines through every square of an n sized board, so the
+    search loops look them up rather than working them out for every
+    neighbor.
+
+    Parameters
+    ----------
+    n : int
+        The size of the board
+
+    Returns
+    -------
+    tuple[tuple[tuple[int, int, int], ...], ...]
+        For each column, the row, diagonal, and anti-diagonal of each of its
+        squares (in order of row)
+    """
+
+    offset = n - 1
+    return tuple(
+        tuple((row, row + col, row - col + offset) for row in range(n))
+        for col in range(n)
+    )
+
+def move_queen(
+            rows: bytearray,
+            lines: tuple[list[int], list[int], list[int]],
+            col: int,
+            row: int
+        ) -> None:
+    """
+    Moves the queen in the given column to the given row, keeping the counts
+    of queens on each line up to date.
+
+    Parameters
+    ----------
+    rows : bytearray
+        The row of the queen in each column, which is changed in place
+    lines : tuple[list[int], list[int], list[int]]
+        The counts of queens on each row, diagonal, and anti-diagonal (as
+        returned by count_lines), which are changed in place
+    col : int
+        The column of the queen to move
+    row : int
+        The row to move the queen to
+    """
+
+    row_counts, diagonals, anti_diagonals = lines
+    offset = len(rows) - 1
+    curr_row = rows[col]
+
+    row_counts[curr_row] -= 1
+    diagonals[curr_row + col] -= 1
+    anti_diagonals[curr_row - col + offset] -= 1
+    row_counts[row] += 1
+    diagonals[row + col] += 1
+    anti_diagonals[row - col + offset] += 1
+    rows[col] = row
+
+def climb(rows: bytearray) -> tuple[bytearray, int]:
+    """
+    Runs the loop of Solver.hill_climb directly on the rows of a Board (which
+    are changed in place).
+
+    Parameters
+    ----------
+    rows : bytearray
+        The row of the queen in each column of the starting Board
+
+    Returns
+    -------
+    tuple[bytearray, int]
+        The rows of the found Board and the cost
+    """
+
+    n = len(rows)
+    offset = n - 1
+    lines = count_lines(rows)
+    row_counts, diagonals, anti_diagonals = lines
+    attacks = count_attacks(rows)
+    squares = column_squares(n)
+
+    cost = 0
+    while True:
+
+        # If we find a solution, exit (no neighbor can beat it)
+        if not attacks:
+            return rows, cost
+
+        # Find the best neighbor (the first one found, on ties). Only
+        # neighbors strictly better than where we are now count
+        best_attacks, best_col, best_row = attacks, -1, -1
+        for col, curr_row in enumerate(rows):
+            if curr_row == EMPTY_ROW:
+                continue
+
+            # Take away the attacks the queen makes from where it is now
+            remaining = attacks - (
+                row_counts[curr_row] +
+                diagonals[curr_row + col] +
+                anti_diagonals[curr_row - col + offset] - 3
+            )
+
+            # And add the attacks it would make from each other square. Its
+            # own square comes to attacks + 3, which never beats where we are
+            # now, so it needn't be skipped
+            for row, diagonal, anti_diagonal in squares[col]:
+                neighbor_attacks = remaining + (
+                    row_counts[row] +
+                    diagonals[diagonal] +
+                    anti_diagonals[anti_diagonal]
+                )
+                if neighbor_attacks < best_attacks:
+                    best_attacks = neighbor_attacks
+                    best_col, best_row = col, row
+
+        # Once there are no more better neighbors, exit. We have reached a
+        # local maxima
+        if best_col < 0:
+            return rows, cost
+
+        # Prepare for the next iteration
+        move_queen(rows, lines, best_col, best_row)
+        attacks = best_attacks
+        cost += 1
+
+def anneal(
+            rows: bytearray,
+            cooling_factor: float,
+            initial_temperature: float
+        ) -> tuple[bytearray, int]:
+    """
+    Runs the annealing loop of Solver.simulated_annealing directly on the rows
+    of a Board (which are changed in place).
+
+    Parameters
+    ----------
+    rows : bytearray
+        The row of the queen in each column of the starting Board
+    cooling_factor : float
+        How much the temperature is multiplied by after every step
+    initial_temperature : float
+        The temperature to start annealing at
+
+    Returns
+    -------
+    tuple[bytearray, int]
+        The rows of the found Board and the cost
+    """
+
+    n = len(rows)
+    offset = n - 1
+    lines = count_lines(rows)
+    row_counts, diagonals, anti_diagonals = lines
+    attacks = count_attacks(rows)
+    columns = [col for col, row in enumerate(rows) if row != EMPTY_ROW]
+
+    # Every move (a queen and one of the other rows in its column) is numbered,
+    # so picking one takes a single call to random() rather than one call to
+    # pick the queen and another to pick its row
+    num_moves = len(columns) * (n - 1)
+    rand = random.random
+
+    cost = 0
+    temperature = initial_temperature
+    # While we have the smallest resemblance of a temperature
+    while temperature >= 1e-300:
+
+        # Pick a random possible move for a random queen
+        col, row = divmod(int(rand() * num_moves), n - 1)
+        col = columns[col]
+        curr_row = rows[col]
+        if row >= curr_row:
+            row += 1
+
+        # Take away the attacks the queen makes from where it is now, and add
+        # the attacks it would make from the new square
+        neighbor_attacks = attacks - (
+            row_counts[curr_row] +
+            diagonals[curr_row + col] +
+            anti_diagonals[curr_row - col + offset] - 3
+        ) + (
+            row_counts[row] +
+            diagonals[row + col] +
+            anti_diagonals[row - col + offset]
+        )
+        delta_e = attacks - neighbor_attacks
+
+        # If this is a better (or as good) solution, store it (exiting early
+        # if we found the solution)
+        # If it isn't, *maybe* store it (depending on the temperature). Moves
+        # that are far too bad for the temperature are turned down without
+        # working out exp()
+        if delta_e >= 0 or (
+            delta_e > ACCEPTANCE_CUTOFF * temperature and
+            rand() < exp(delta_e / temperature)
+        ):
+
+            move_queen(rows, lines, col, row)
+            attacks = neighbor_attacks
+
+            if not attacks:
+                return rows, cost
+
+        # Cool it down
+        temperature *= cooling_factor
+        cost += 1
+
+    return rows, cost
+
+def resolve_conflicts(
+            rows: bytearray,
+            max_steps: int
+        ) -> tuple[bytearray, int]:
+    """
+    Runs the loop of Solver.min_conflicts directly on the rows of a Board
+    (which are changed in place).
+
+    Parameters
+    ----------
+    rows : bytearray
+        The row of the queen in each column of the starting Board
+    max_steps : int
+        The most queens to move before giving up
+
+    Returns
+    -------
+    tuple[bytearray, int]
+        The rows of the found Board and the cost
+    """
+
+    n = len(rows)
+    offset = n - 1
+    lines = count_lines(rows)
+    row_counts, diagonals, anti_diagonals = lines
+    attacks = count_attacks(rows)
+    squares = column_squares(n)
+    rand = random.random
+
+    cost = 0
+    for _ in range(max_steps):
+
+        # If we find a solution, exit
+        if not attacks:
+            return rows, cost
+
+        # Retrieve a random queen that's under attack (sharing a line with
+        # another queen)
+        conflicting = [
+            col for col, row in enumerate(rows)
+            if row != EMPTY_ROW and (
+                row_counts[row] > 1 or
+                diagonals[row + col] > 1 or
+                anti_diagonals[row - col + offset] > 1
+            )
+        ]
+        col = conflicting[int(rand() * len(conflicting))]
+        curr_row = rows[col]
+
+        # Move it out of danger, to the row it would be attacked the least on
+        # (the lowest such row, on ties)
+        remaining = attacks - (
+            row_counts[curr_row] +
+            diagonals[curr_row + col] +
+            anti_diagonals[curr_row - col + offset] - 3
+        )
+        attacks, row = min(
+            (
+                remaining +
+                row_counts[row] +
+                diagonals[diagonal] +
+                anti_diagonals[anti_diagonal],
+                row
+            )
+            for row, diagonal, anti_diagonal in squares[col]
+            if row != curr_row
+        )
+
+        # Prepare for the next iteration
+        move_queen(rows, lines, col, row)
+        cost += 1
+
+    return rows, cost
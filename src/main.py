@@ -1,6 +1,10 @@
 from solver import Solver, attempt
 
-attempt(500, Solver.hill_climb)
-attempt(500, Solver.simulated_annealing)
-attempt(10, Solver.genetic_algorithm)
-attempt(500, Solver.min_conflicts)
\ No newline at end of file
+# The guard keeps the worker processes spawned by attempt() from re-running
+# the trials themselves
+if __name__ == "__main__":
+    attempt(500, Solver.hill_climb, log=True)
+    attempt(500, Solver.random_restart_hill_climb, log=True)
+    attempt(500, Solver.simulated_annealing, log=True)
+    attempt(10, Solver.genetic_algorithm, log=True)
+    attempt(500, Solver.min_conflicts, log=True)
\ No newline at end of file
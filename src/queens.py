@@ -1,7 +1,17 @@
 from __future__ import annotations
+from functools import lru_cache
+from itertools import chain
 import random
+from typing import Sequence
+
+# The row stored for an empty column. Rows are stored as bytes, so this is the
+# one value that can never be a real row
+EMPTY_ROW = 255
 
 class Queen:
+
+    __slots__ = ("row",)
+
     def __init__(self, row: int = 0):
         self.row = row
 
@@ -11,44 +21,127 @@ class Queen:
     def __repr__(self) -> str:
         return str(self.row)
 
-    def __eq__(self, o: object):
-        return isinstance(o, Queen) and self.row == o.row
+def count_lines(
+            rows: Sequence[int]
+        ) -> tuple[list[int], list[int], list[int]]:
+    # Tallies how many queens sit on each row, diagonal (indexed by row + col),
+    # and anti-diagonal (indexed by row - col + n - 1) in a single pass. These
+    # functions are kept free of any Board or Queen lookups since they are the
+    # innermost loops of every solver
+    n = len(rows)
+    row_counts = [0] * n
+    diagonals = [0] * (2 * n - 1)
+    anti_diagonals = [0] * (2 * n - 1)
+    for col, row in enumerate(rows):
+        if row == EMPTY_ROW:
+            continue
+        row_counts[row] += 1
+        diagonals[row + col] += 1
+        anti_diagonals[row - col + n - 1] += 1
+
+    return row_counts, diagonals, anti_diagonals
+
+@lru_cache(maxsize=None)
+def pair_counts(n: int) -> tuple[int, ...]:
+    # Precomputes c choose 2 (the number of attack pairs between c queens on
+    # the same line) for every c a line of an n sized board can hold, so
+    # counting attacks on the usual 8 sized board is only table lookups
+    return tuple(count * (count - 1) // 2 for count in range(n + 1))
+
+def count_attacks(rows: Sequence[int]) -> int:
+    # Counts the attack pairs on a board given the row of the queen in each
+    # column. Rather than comparing every queen pair, we count the queens on
+    # each line
+
+    # A line holding c queens contributes one attack pair for each pairing of
+    # its queens, or c choose 2
+    pairs = pair_counts(len(rows))
+    return sum(map(pairs.__getitem__, chain(*count_lines(rows))))
+
+def count_attacks_on(
+            rows: Sequence[int],
+            col: int,
+            row: int,
+            *ignored: int
+        ) -> int:
+    # Counts the attacks between a queen at the given column and row and every
+    # other queen on the board (skipping the queen's own column and any
+    # ignored columns)
+    attacks = 0
+    if row == EMPTY_ROW:
+        return attacks
 
-    def __hash__(self):
-        return hash(self.row)
+    for other_col, other_row in enumerate(rows):
+        if other_row == EMPTY_ROW or other_col == col or other_col in ignored:
+            continue
 
-    def __sub__(self, other: Queen):
-        return self.row - other.row
+        # Straight ahead or diagonal attack (a pair in different columns can
+        # only ever attack each other one way)
+        if other_row == row or abs(other_col - col) == abs(other_row - row):
+            attacks += 1
 
-    def possible_moves(self, n) -> list[Queen]:
-        return [Queen(i) for i in range(0, n) if i != self.row]
+    return attacks
 
 class Board:
 
     NON_QUEEN = "-"
 
+    # Solvers create and throw away Boards by the thousand, so they skip the
+    # per-instance __dict__ (which also makes their attribute lookups quicker)
+    __slots__ = (
+        "n", "rows", "available", "_attacks", "_lines"
+    )
+
     def __init__(self, n: int = 8):
+        if n > EMPTY_ROW:
+            raise ValueError("Exceeded Board Limit")
+
         self.n = n
-        self.queens: list[Queen | None] = [None for _ in range(n)]
+
+        # The board is stored as the row of the queen in each column (or
+        # EMPTY_ROW for an empty column) packed into a bytearray, rather than
+        # as individual Queen objects
+        self.rows = bytearray([EMPTY_ROW]) * n
         self.available = 0
 
+        # The number of attacks is cached until the queens are changed, and so
+        # are the counts of queens on each line (which are only ever replaced,
+        # never changed in place, so clones can share them)
+        self._attacks: int | None = None
+        self._lines: tuple[list[int], list[int], list[int]] | None = None
+
+    @property
+    def queens(self) -> tuple[Queen | None, ...]:
+        # Retrieve the queens of the board as Queen objects. These are built
+        # fresh from the rows, so they come as a tuple (assigning into it
+        # would never change the board). Use set_row to move a queen
+        return tuple(
+            None if row == EMPTY_ROW else Queen(row) for row in self.rows
+        )
+
     @classmethod
     def random_fill(cls, n: int = 8) -> Board:
-        return cls.from_str(
-            "".join([str(random.randint(0, n - 1)) for _ in range(n)])
-        )
+        return cls(n).random_fill_inplace()
+
+    def random_fill_inplace(self) -> Board:
+        # Place a queen on a random row of every column, reusing this Board
+        # (and its rows buffer) rather than making a new one
+        n = self.n
+        self.rows[:] = [random.randint(0, n - 1) for _ in range(n)]
+        self.available = n
+
+        self._attacks = None
+        self._lines = None
+        return self
 
     @classmethod
     def from_str(cls, identifier: str) -> Board:
         b = cls(len(identifier))
 
-        i: str | int
-        for i in identifier:
-            assert isinstance(i, str)
+        for col, i in enumerate(identifier):
 
             # Ensure the passed identifier is valid
             if i == cls.NON_QUEEN:
-                b.add_queen(None)
                 continue
 
             if not i.isdigit():
@@ -56,9 +149,30 @@ class Board:
                     f"ID must be composed of digits or {cls.NON_QUEEN}"
                 )
 
-            # Add the queen
-            i = int(i)
-            b.add_queen(Queen(i))
+            # Place the queen's row directly
+            row = int(i)
+            if row >= b.n:
+                raise ValueError("Exceeded Board Limit")
+            b.rows[col] = row
+
+        b.available = b.n
+        return b
+
+    @classmethod
+    def from_rows(cls, rows: bytearray) -> Board:
+        # Create a Board that takes ownership of the given rows
+        b = cls(len(rows))
+        b.rows = rows
+        b.available = b.n
+
+        return b
+
+    def clone(self) -> Board:
+        # Copy the board (along with its cached attack count) without
+        # round-tripping through its string identifier
+        b = type(self).from_rows(self.rows.copy())
+        b._attacks = self._attacks
+        b._lines = self._lines
 
         return b
 
@@ -68,9 +182,15 @@ class Board:
         if self.available >= self.n or (queen and queen.row >= self.n):
             raise ValueError("Exceeded Board Limit")
 
-        # Add the queen
-        self.queens[self.available] = queen
+        # Add the queen, keeping the cached attack count up to date the same
+        # way set_row does (the column it goes in is still empty)
+        row = queen.row if queen else EMPTY_ROW
+        if self._attacks is not None:
+            self._attacks = self.attacks_if_changed(self.available, row)
+
+        self.rows[self.available] = row
         self.available += 1
+        self._lines = None
 
         return self
 
@@ -81,70 +201,203 @@ class Board:
 
         return self
 
-    def compare_queens(
-                self,
-                first_ind: int,
-                first_queen: Queen | None,
-                second_ind: int,
-                second_queen: Queen | None
-            ) -> int:
-        # Checks how many attacks are found between the two given queens
-        attacks = 0
+    def set_row(self, index: int, row: int) -> Board:
+        # Move the queen at the given index to the given row
 
-        # Skip if we are attacking ourselves
-        if first_ind == second_ind or not (first_queen and second_queen):
-            return attacks
+        # Keep the cached attack count up to date by only recounting the
+        # attacks made by the moved queen
+        if self._attacks is not None:
+            self._attacks = self.attacks_if_changed(index, row)
 
-        # Straight ahead attack
-        if first_queen == second_queen:
-            attacks += 1
+        self.rows[index] = row
+        self._lines = None
+        return self
 
-        # Diagonal attack
-        if abs(first_ind - second_ind) == abs(first_queen - second_queen):
-            attacks += 1
+    def swap_queens(self, first_ind: int, second_ind: int) -> Board:
+        # Swap the queens at the two given indices
+        first_row = self.rows[first_ind]
+        second_row = self.rows[second_ind]
+
+        # The swapped pair attacks each other the same way before and after
+        # the swap, so only their attacks on the rest of the board change
+        if self._attacks is not None:
+            self._attacks += (
+                self.attacks_against(
+                    first_ind, second_row, first_ind, second_ind
+                ) +
+                self.attacks_against(
+                    second_ind, first_row, first_ind, second_ind
+                ) -
+                self.attacks_against(
+                    first_ind, first_row, first_ind, second_ind
+                ) -
+                self.attacks_against(
+                    second_ind, second_row, first_ind, second_ind
+                )
+            )
 
-        return attacks
+        self.rows[first_ind] = second_row
+        self.rows[second_ind] = first_row
+        self._lines = None
+        return self
+
+    def attacks_against(
+                self,
+                index: int,
+                row: int,
+                *ignored: int
+            ) -> int:
+        # Counts the attacks between a queen placed at the given index and row
+        # and every other queen on the board (skipping any ignored indices)
+        return count_attacks_on(self.rows, index, row, *ignored)
 
     @property
     def num_attacking(self) -> int:
+        # Only count the attacks if the queens changed since the last count
+        if self._attacks is None:
+            self._attacks = self.count_attacks()
+
+        return self._attacks
+
+    @num_attacking.setter
+    def num_attacking(self, attacks: int) -> None:
+        # Store an attack count worked out elsewhere (by the worker processes
+        # of the genetic algorithm, say). It must match the current queens
+        self._attacks = attacks
+
+    @property
+    def has_cached_attacks(self) -> bool:
+        # Check whether the attacks are already counted, so reading
+        # num_attacking won't have to count them
+        return self._attacks is not None
+
+    def count_attacks(self) -> int:
         # Count the total number of attacks being made
-        attacks = 0
-        for first_ind, first_queen in enumerate(self.queens):
-            for second_ind, second_queen in enumerate(self.queens):
+        return count_attacks(self.rows)
 
-                # For every queen pair, count its attacks
-                attacks += self.compare_queens(
-                    first_ind, first_queen, second_ind, second_queen
-                )
+    @property
+    def is_solved(self) -> bool:
+        # Check whether no queens are attacking each other
+        if self._attacks is not None:
+            return not self._attacks
+
+        # Otherwise, every row, diagonal, and anti-diagonal gets a bit in a
+        # bitboard, and we stop at the first queen whose line is already taken
+        # (which skips counting every attack on an unsolved board)
+        taken_rows = taken_diagonals = taken_anti_diagonals = 0
+        offset = self.n - 1
+        for col, row in enumerate(self.rows):
+            if row == EMPTY_ROW:
+                continue
+
+            row_bit = 1 << row
+            diagonal_bit = 1 << (row + col)
+            anti_diagonal_bit = 1 << (row - col + offset)
+            if taken_rows & row_bit or taken_diagonals & diagonal_bit or \
+                taken_anti_diagonals & anti_diagonal_bit:
+                return False
+
+            taken_rows |= row_bit
+            taken_diagonals |= diagonal_bit
+            taken_anti_diagonals |= anti_diagonal_bit
 
-        # An attack is inherently done in pairs (can't attack a queen if there
-        # aren't 2 queens). We divide by 2 to retrieve the number of attack
-        # pairs
-        return attacks//2
+        return True
 
     @property
-    def conflicting_queens(self) -> set[tuple[int, Queen]]:
-        # Retrieve a set of queens (and their indices) that are attacking
-        conflicting = set()
+    def line_counts(self) -> tuple[list[int], list[int], list[int]]:
+        # Retrieve how many queens sit on each row, diagonal, and anti-diagonal
+        if self._lines is None:
+            self._lines = count_lines(self.rows)
+
+        return self._lines
+
+    def attacks_without(self, index: int) -> int:
+        # Retrieve how many attacks there would be with the queen at the given
+        # index taken off the board
+        attacks = self.num_attacking
+        curr_row = self.rows[index]
+        if curr_row == EMPTY_ROW:
+            return attacks
+
+        # Take away the attacks the queen makes from where it is now (the
+        # queen is on each of its own lines once)
+        row_counts, diagonals, anti_diagonals = self.line_counts
+        return attacks - (
+            row_counts[curr_row] +
+            diagonals[curr_row + index] +
+            anti_diagonals[curr_row - index + self.n - 1] - 3
+        )
+
+    def attacks_if_changed(self, index: int, row: int) -> int:
+        # Retrieve how many attacks there would be if the queen at the given
+        # index was moved to the given row, without moving it
+        if row == self.rows[index]:
+            return self.num_attacking
 
-        for first_ind, first_queen in enumerate(self.queens):
-            for second_ind, second_queen in enumerate(self.queens):
+        attacks = self.attacks_without(index)
+        row_counts, diagonals, anti_diagonals = self.line_counts
+        offset = self.n - 1
 
-                # If we already have this pairing
-                if (first_ind, first_queen) in conflicting and \
-                    (second_ind, second_queen) in conflicting:
-                    continue
+        # Every queen on the lines of the new square would be attacked
+        if row != EMPTY_ROW:
+            attacks += (
+                row_counts[row] +
+                diagonals[row + index] +
+                anti_diagonals[row - index + offset]
+            )
 
-                # If there is an attack
-                if self.compare_queens(
-                    first_ind, first_queen, second_ind, second_queen
-                ):
-                    if first_queen:
-                        conflicting.add((first_ind, first_queen))
-                    if second_queen:
-                        conflicting.add((second_ind, second_queen))
+        return attacks
+
+    def neighbor(self, index: int, row: int) -> Board:
+        # Retrieve a copy of this Board with the queen at the given index moved
+        # to the given row
+        # The clone is given our attack and line counts (counting them first
+        # if need be), so the move's attack count is worked out without
+        # recounting
+        b = self.clone()
+        b._attacks = self.num_attacking
+        b._lines = self.line_counts
+
+        return b.set_row(index, row)
+
+    def random_neighbor(self) -> Board:
+        # Retrieve a random one of the possible moves from this Board (every
+        # move being equally likely) without building any of the others
+        columns = [
+            col for col, row in enumerate(self.rows) if row != EMPTY_ROW
+        ]
 
-        return conflicting
+        # Every move (a queen and one of the other rows in its column) is
+        # numbered, so a single draw picks both the queen and where it goes
+        index, row = divmod(
+            int(random.random() * len(columns) * (self.n - 1)), self.n - 1
+        )
+        index = columns[index]
+
+        # Skip over the row the queen is already on
+        if row >= self.rows[index]:
+            row += 1
+
+        return self.neighbor(index, row)
+
+    @property
+    def conflicting_queens(self) -> tuple[int, ...]:
+        # Retrieve the indices of the queens that are under attack, which can
+        # be indexed into directly (to pick a random one, say)
+
+        # A queen is under attack whenever it shares one of its lines with
+        # another queen
+        row_counts, diagonals, anti_diagonals = self.line_counts
+        offset = self.n - 1
+
+        return tuple(
+            col for col, row in enumerate(self.rows)
+            if row != EMPTY_ROW and (
+                row_counts[row] > 1 or
+                diagonals[row + col] > 1 or
+                anti_diagonals[row - col + offset] > 1
+            )
+        )
 
     def __ge__(self, o: Board):
         return self.num_attacking >= o.num_attacking
@@ -157,23 +410,24 @@ class Board:
         # Retrieve a list of all possible moves from this Board
         possible_boards: list[Board] = []
 
-        for ind, curr_queen in enumerate(self.queens):
-            if not curr_queen:
+        for ind, curr_row in enumerate(self.rows):
+            if curr_row == EMPTY_ROW:
                 continue
             # Add the specified queens' possible moves
-            possible_boards += self.possible_moves_part(ind, curr_queen)
+            possible_boards += self.possible_moves_part(ind)
 
         return possible_boards
 
-    def possible_moves_part(self, index: int, curr_queen: Queen) -> list[Board]:
+    def possible_moves_part(self, index: int) -> list[Board]:
 
         possible_boards = []
 
-        # Add every possible position for the given queen
-        for possible_queen in curr_queen.possible_moves(self.n):
-            b = Board.from_str(repr(self))
-            b.queens[index] = possible_queen
-            possible_boards.append(b)
+        # Add every possible position for the queen at the given index
+        for possible_row in range(self.n):
+            if possible_row == self.rows[index]:
+                continue
+
+            possible_boards.append(self.neighbor(index, possible_row))
 
         return possible_boards
 
@@ -184,11 +438,9 @@ class Board:
             [self.NON_QUEEN for _ in range(self.n)] for _ in range(self.n)
         ]
 
-        curr_col = 0
-        for queen in self.queens:
+        for col, queen in enumerate(self.queens):
             if queen:
-                matrix_repr[queen.row][curr_col] = str(queen)
-            curr_col += 1
+                matrix_repr[queen.row][col] = str(queen)
 
         return "\n".join(["  ".join(i) for i in matrix_repr])
 
@@ -196,5 +448,8 @@ class Board:
         # Print the board in an ugly way
         # This gives us easy access to the string identifier of a Board
         return "".join(
-            [repr(queen) if queen else self.NON_QUEEN for queen in self.queens]
+            [
+                self.NON_QUEEN if row == EMPTY_ROW else str(row)
+                for row in self.rows
+            ]
         )
\ No newline at end of file
@@ -1,10 +1,14 @@
-from math import exp
+from __future__ import annotations
+from functools import partial, wraps
+from multiprocessing import Pool, current_process
+import os
 import random
-from time import time
+from time import perf_counter_ns
 from typing import Any, Callable
 
-from queens import Board, Queen
+from queens import Board
 from ga_utils import GeneticAlgorithm
+from kernels import anneal, climb, resolve_conflicts
 
 def time_solver(
             solver: Callable[..., tuple[Board, int]]
@@ -29,16 +33,19 @@ def time_solver(
         and running time
     """
 
+    # Copying the solver's name over (rather than just __name__) lets the
+    # wrapper be pickled and sent to the worker processes of attempt()
+    @wraps(solver)
     def wrapper(*args: Any) -> tuple[Board, int, float]:
-        start_time = time()
+        # perf_counter_ns is monotonic and has a far finer resolution than
+        # time(), which matters for solves that take well under a millisecond
+        start_time = perf_counter_ns()
         board, cost = solver(*args)
-        duration = time() - start_time
+        duration = (perf_counter_ns() - start_time) / 1e9
 
         # print(f"({solver.__name__}) Time Taken: {duration / 60:.4f} minutes")
         return board, cost, duration
 
-    wrapper.__name__ = solver.__name__
-
     return wrapper
 
 class Solver:
@@ -47,19 +54,31 @@ class Solver:
     @time_solver
     def hill_climb(board: Board) -> tuple[Board, int]:
 
-        cost = 0
-        best = board
-        while True:
-            neighbor = min(best.possible_moves, key=lambda x: x.num_attacking)
+        # The climbing itself works on a copy of the Board's rows
+        rows, cost = climb(board.rows.copy())
+        return Board.from_rows(rows), cost
+
+    @staticmethod
+    @time_solver
+    def random_restart_hill_climb(
+                board: Board,
+                max_restarts: int = 50
+            ) -> tuple[Board, int]:
+
+        # Hill climb, and whenever we get stuck on a local maxima, start again
+        # from a new random Board (at most max_restarts times). The cost is
+        # that of every climb put together
+        rows, cost = climb(board.rows.copy())
+        best = Board.from_rows(rows)
+        for _ in range(max_restarts):
+            if best.is_solved:
+                break
 
-            # Once there are no more better neighbors, exit. We have reached
-            # a local maxima
-            if neighbor >= best:
-                return best, cost
+            rows, restart_cost = climb(Board.random_fill(board.n).rows)
+            best = Board.from_rows(rows)
+            cost += restart_cost
 
-            # Prepare for the next iteration
-            best = neighbor
-            cost += 1
+        return best, cost
 
     @staticmethod
     @time_solver
@@ -69,63 +88,38 @@ class Solver:
                 initial_temperature: float = 500_000
             ) -> tuple[Board, int]:
 
-        cost = 0
-        current = board
-        temperature = initial_temperature
-        # While we have the smallest resemblance of a temperature
-        while temperature >= 1e-300:
-
-            neighbor = random.choice(current.possible_moves)
-            delta_e = current.num_attacking - neighbor.num_attacking
-
-            # Early exit if we found the solution
-            if not neighbor.num_attacking:
-                return neighbor, cost
-
-            # If this is a better solution, store it
-            # If it isn't, *maybe* store it (depending on the temperature)
-            if delta_e > 0 or random.random() < exp(delta_e / temperature):
-                current = neighbor
-
-            # Cool it down
-            temperature *= cooling_factor
-            cost += 1
-
-        return current, cost
+        # The annealing itself works on a copy of the Board's rows
+        rows, cost = anneal(
+            board.rows.copy(), cooling_factor, initial_temperature
+        )
+        return Board.from_rows(rows), cost
 
     @staticmethod
     @time_solver
-    def genetic_algorithm(board: Board, log: bool = False) -> tuple[Board, int]:
-        ga = GeneticAlgorithm(board, log)
+    def genetic_algorithm(
+                board: Board,
+                log: bool = False,
+                n_workers: int = 1
+            ) -> tuple[Board, int]:
+
+        # Fitness can be evaluated over a pool of worker processes. Worker
+        # processes (like those of attempt()) can't start pools of their own,
+        # so they always evaluate it themselves
+        if n_workers > 1 and not current_process().daemon:
+            with Pool(n_workers) as pool:
+                ga = GeneticAlgorithm(board, log, pool)
+        else:
+            ga = GeneticAlgorithm(board, log)
+
         return ga.best, ga.cost
 
     @staticmethod
     @time_solver
     def min_conflicts(board: Board, max_steps: int = 9999) -> tuple[Board, int]:
 
-        cost = 0
-        current = board
-        conflict: Queen
-        for _ in range(max_steps):
-
-            # If we find a solution, exit
-            if not current.num_attacking:
-                return current, cost
-
-            # Retrieve a random queen that's under attack
-            con_ind, conflict = random.choice(list(current.conflicting_queens))
-
-            # Move it out of danger
-            min_conflict = min(
-                current.possible_moves_part(con_ind, conflict),
-                key=lambda x: x.num_attacking
-            )
-
-            # Prepare for the next iteration
-            current = min_conflict
-            cost += 1
-
-        return current, cost
+        # The search itself works on a copy of the Board's rows
+        rows, cost = resolve_conflicts(board.rows.copy(), max_steps)
+        return Board.from_rows(rows), cost
 
     @staticmethod
     @time_solver
@@ -142,25 +136,46 @@ class Solver:
         while True:
             for index, individual in enumerate(population):
 
-                if not individual.num_attacking:
+                if individual.is_solved:
                     return individual, cost
 
                 else:
-                    randomly_generated = Board.random_fill()
+                    # Replace the individual by refilling it in place
+                    if individual.random_fill_inplace().is_solved:
+                        return individual, cost
+
+                cost += 1
 
-                    if not randomly_generated.num_attacking:
-                        return randomly_generated, cost
+def run_trial(
+        solver: Callable[..., tuple[Board, int, float]],
+        args: tuple[Any, ...],
+        seed: int | None
+    ) -> tuple[Board, Board, int, float]:
+    # Runs a single trial of a solver on a random Board, returning the input
+    # Board along with what the solver returned. This lives at the module
+    # level so the worker processes of attempt() can pickle it
 
-                    population[index] = randomly_generated
+    # Seeding every trial on its own keeps the trials repeatable, however they
+    # end up spread over the processes
+    if seed is not None:
+        random.seed(seed)
 
-                cost += 1
+    board = Board.random_fill(8)
+    return (board, *solver(board, *args))
 
 def attempt(
         total_trials: int,
         solver: Callable[..., tuple[Board, int, float]],
-        *args
+        *args,
+        processes: int | None = None,
+        seed: int | None = None,
+        log: bool = False
     ):
     # Attempts a given solver(*args) for a given amount of trials
+    # The trials are independent of each other, so they are spread out over a
+    # pool of processes (one per core unless told otherwise). Given a seed,
+    # trial i is seeded with seed + i. With log, the first 3 correct trials
+    # are printed out as well
 
     print(f"({solver.__name__})")
 
@@ -168,27 +183,42 @@ def attempt(
     correct: int = 0
     running_cost: int = 0
     running_duration: float = 0
-    while trials > 0:
 
-        # Some simple logging
-        if trials == total_trials or not trials % 100:
-            print(f"{trials} trials remaining. {correct} correct so far.")
+    seeds = (
+        [None] * total_trials if seed is None
+        else range(seed, seed + total_trials)
+    )
+
+    # Trials are quick, so hand them out in chunks (several per process, to
+    # keep the processes evenly loaded) rather than paying for the
+    # communication one trial at a time
+    processes = processes or os.cpu_count() or 1
+    chunksize = max(1, total_trials // (8 * processes))
+
+    with Pool(processes) as pool:
+        results = pool.imap_unordered(
+            partial(run_trial, solver, args), seeds, chunksize
+        )
 
-        # Perform the solving
-        inp = Board.random_fill(8)
-        out, cost, duration = solver(inp, *args)
-        running_cost += cost
-        running_duration += duration
-        if out.num_attacking == 0:
-            correct += 1
+        for inp, out, cost, duration in results:
 
-            # Print the first 3 correct outputs
-            if correct <= 3:
-                print(f"INPUT\n{inp}", "\nAttacks: ", inp.num_attacking)
-                print(f"OUTPUT\n{out}")
-                print("||||||||||||||||||||||||||||||||||||||||||||||")
+            # Some simple logging
+            if trials == total_trials or not trials % 100:
+                print(f"{trials} trials remaining. {correct} correct so far.")
 
-        trials -= 1
+            # Collect the results of the solving
+            running_cost += cost
+            running_duration += duration
+            if out.is_solved:
+                correct += 1
+
+                # Print the first 3 correct outputs
+                if log and correct <= 3:
+                    print(f"INPUT\n{inp}", "\nAttacks: ", inp.num_attacking)
+                    print(f"OUTPUT\n{out}")
+                    print("||||||||||||||||||||||||||||||||||||||||||||||")
+
+            trials -= 1
 
     # If there is an early exit of some kind
     complete_trials = total_trials - trials
@@ -201,5 +231,3 @@ def attempt(
     print(f"Average Cost: {running_cost / (complete_trials)}.")
     print(f"Average Time Taken: {(running_duration / (complete_trials)):.4f}s.")
     print()
-
-